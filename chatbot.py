@@ -2,14 +2,24 @@
 Main chatbot logic for PMC website
 """
 import openai
-from typing import List, Dict, Any, Optional
-import json
+from collections import deque
+from typing import Deque, Iterator, List, Dict, Any, Optional, Tuple
+import numpy as np
 from datetime import datetime
 from utils import setup_logging, get_config, validate_config
 from vector_store import PMCVectorStore
+from proximity_cache import ProximityCache
+from feedback_log import log_feedback
 
 logger = setup_logging()
 
+# Fixed header and footer around the retrieved context
+CONTEXT_TEMPLATE = """Use the following information from the PMO website to answer the user's question:
+
+{context}
+
+Please provide a helpful response based on this information. If the information doesn't answer the question completely, say so."""
+
 class PMCChatbot:
     def __init__(self):
         self.config = get_config()
@@ -19,11 +29,19 @@ class PMCChatbot:
         # Initialize OpenAI client
         self.client = openai.OpenAI(api_key=self.config['openai_api_key'])
         
-        # Initialize vector store
+        # Initialize vector store, with the suggested questions embedded up front
         self.vector_store = PMCVectorStore()
+        self.vector_store.precompute_query_embeddings(self.get_suggested_questions())
         
-        # Chat history
-        self.conversation_history: List[Dict[str, str]] = []
+        # Cache of (context, response) pairs keyed on question embeddings
+        self.response_cache = ProximityCache(
+            capacity=self.config['cache_capacity'],
+            tolerance=self.config['cache_tolerance']
+        )
+        
+        # Chat history, capped so long sessions don't grow without bound
+        self.history_window = self.config['history_window']
+        self.conversation_history: Deque[Dict[str, str]] = deque(maxlen=self.history_window * 2)
         
         # System prompt
         self.system_prompt = """You are an AI assistant for the Prime Minister's Office (PMO) website. Your role is to help users find information about:
@@ -43,64 +61,93 @@ Key guidelines:
 - Always cite sources when possible
 - Be concise but informative
 - Respond in a helpful and friendly manner"""
+        self.system_message = {"role": "system", "content": self.system_prompt}
+    
+    def _build_messages(self, context: str) -> List[Dict[str, str]]:
+        """Build the message list sent to OpenAI"""
+        messages = [self.system_message]
+        
+        # Add conversation history (most recent messages to avoid token limits).
+        # Earlier turns go before the per-question context so the start of the
+        # request stays identical from turn to turn for prompt caching.
+        *earlier_history, current = list(self.conversation_history)[-self.history_window:]
+        for msg in earlier_history:
+            if msg['role'] in ('user', 'assistant'):
+                messages.append({"role": msg['role'], "content": msg['content']})
+        
+        # Add context if available
+        if context:
+            messages.append({"role": "system", "content": CONTEXT_TEMPLATE.format(context=context)})
+        
+        messages.append({"role": "user", "content": current['content']})
+        return messages
+    
+    def _start_turn(self, user_message: str, use_context: bool) -> Tuple[str, Optional[np.ndarray], Optional[Tuple[str, str]]]:
+        """Record the user message and find the context (or cached answer) for it"""
+        # Add user message to history
+        self.conversation_history.append({
+            'role': 'user',
+            'content': user_message,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+        context = ""
+        query_embedding = None
+        cached = None
+        if use_context:
+            # Reuse a cached answer for the same (or a paraphrased) question
+            query_embedding = self.vector_store.embed(user_message)
+            if query_embedding is not None:
+                cached = self.response_cache.get(query_embedding)
+            
+            if cached:
+                context = cached[0]
+            else:
+                context = self.vector_store.get_relevant_context(
+                    user_message, query_embedding=query_embedding
+                )
+        
+        return context, query_embedding, cached
+    
+    def _finish_turn(self, assistant_message: str, context: str,
+                     query_embedding: Optional[np.ndarray], cached: Optional[Tuple[str, str]]):
+        """Cache a freshly generated answer and add it to history"""
+        if not cached and query_embedding is not None and assistant_message:
+            self.response_cache.put(query_embedding, (context, assistant_message))
+        
+        # Add assistant response to history
+        self.conversation_history.append({
+            'role': 'assistant',
+            'content': assistant_message,
+            'timestamp': datetime.now().isoformat()
+        })
     
     def get_response(self, user_message: str, use_context: bool = True) -> Dict[str, Any]:
         """Generate a response to user message"""
         try:
-            # Add user message to history
-            self.conversation_history.append({
-                'role': 'user',
-                'content': user_message,
-                'timestamp': datetime.now().isoformat()
-            })
+            context, query_embedding, cached = self._start_turn(user_message, use_context)
             
-            # Get relevant context if enabled
-            context = ""
-            if use_context:
-                context = self.vector_store.get_relevant_context(user_message)
-            
-            # Build messages for OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add context if available
-            if context:
-                context_message = f"""Use the following information from the PMO website to answer the user's question:
-
-{context}
-
-Please provide a helpful response based on this information. If the information doesn't answer the question completely, say so."""
-                messages.append({"role": "system", "content": context_message})
-            
-            # Add conversation history (last 5 messages to avoid token limits)
-            recent_history = self.conversation_history[-10:]  # Last 10 messages
-            for msg in recent_history:
-                if msg['role'] == 'user':
-                    messages.append({"role": "user", "content": msg['content']})
-                elif msg['role'] == 'assistant':
-                    messages.append({"role": "assistant", "content": msg['content']})
-            
-            # Generate response
-            response = self.client.chat.completions.create(
-                model=self.config['model_name'],
-                messages=messages,
-                temperature=self.config['temperature'],
-                max_tokens=self.config['max_tokens']
-            )
-            
-            assistant_message = response.choices[0].message.content
+            if cached:
+                assistant_message = cached[1]
+            else:
+                # Generate response
+                response = self.client.chat.completions.create(
+                    model=self.config['model_name'],
+                    messages=self._build_messages(context),
+                    temperature=self.config['temperature'],
+                    max_tokens=self.config['max_tokens']
+                )
+                
+                assistant_message = response.choices[0].message.content
             
-            # Add assistant response to history
-            self.conversation_history.append({
-                'role': 'assistant',
-                'content': assistant_message or "",
-                'timestamp': datetime.now().isoformat()
-            })
+            self._finish_turn(assistant_message or "", context, query_embedding, cached)
             
             # Prepare response
             response_data = {
                 'response': assistant_message,
                 'context_used': bool(context),
                 'context_length': len(context),
+                'cache_hit': bool(cached),
                 'timestamp': datetime.now().isoformat(),
                 'model_used': self.config['model_name']
             }
@@ -117,6 +164,38 @@ Please provide a helpful response based on this information. If the information
             }
             return error_response
     
+    def stream_response(self, user_message: str, use_context: bool = True) -> Iterator[str]:
+        """Generate a response to user message, yielding text as it arrives"""
+        try:
+            context, query_embedding, cached = self._start_turn(user_message, use_context)
+            
+            if cached:
+                assistant_message = cached[1]
+                yield assistant_message
+            else:
+                stream = self.client.chat.completions.create(
+                    model=self.config['model_name'],
+                    messages=self._build_messages(context),
+                    temperature=self.config['temperature'],
+                    max_tokens=self.config['max_tokens'],
+                    stream=True
+                )
+                
+                parts = []
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield parts[-1]
+                
+                assistant_message = "".join(parts)
+            
+            self._finish_turn(assistant_message, context, query_embedding, cached)
+            logger.info(f"Streamed response for: {user_message[:50]}...")
+            
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            yield "I apologize, but I'm experiencing technical difficulties. Please try again later."
+    
     def search_documents(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
         """Search for relevant documents"""
         try:
@@ -127,8 +206,8 @@ Please provide a helpful response based on this information. If the information
             return []
     
     def get_conversation_history(self) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return self.conversation_history.copy()
+        """Get conversation history (bounded by the history window, so copying is cheap)"""
+        return list(self.conversation_history)
     
     def clear_conversation_history(self):
         """Clear conversation history"""
@@ -144,6 +223,7 @@ Please provide a helpful response based on this information. If the information
                 'temperature': self.config['temperature'],
                 'max_tokens': self.config['max_tokens'],
                 'vector_store_stats': stats,
+                'response_cache_size': len(self.response_cache),
                 'conversation_length': len(self.conversation_history)
             }
         except Exception as e:
@@ -193,9 +273,8 @@ Please provide a helpful response based on this information. If the information
                 'helpful': feedback.get('helpful', False)
             }
             
-            # Save feedback to file
-            with open('data/feedback.json', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(feedback_data, ensure_ascii=False) + '\n')
+            # Queue feedback for the background writer
+            log_feedback(feedback_data)
             
             logger.info(f"Feedback received: rating={feedback.get('rating', 0)}")
             return True
@@ -0,0 +1,85 @@
+"""
+On-disk cache of chunk embeddings for PMC chatbot indexing
+"""
+import os
+import hashlib
+from typing import Callable, Dict, List
+import numpy as np
+
+class EmbeddingCache:
+    """Stores embeddings in a memory-mapped .npy file keyed by a hash of the chunk text.
+    
+    New embeddings are held in memory until flush() writes them out, so an
+    indexing run rewrites the cache files once instead of once per batch.
+    """
+    
+    def __init__(self, directory: str, namespace: str):
+        self.embeddings_path = os.path.join(directory, 'embeddings.npy')
+        self.keys_path = os.path.join(directory, 'embedding_keys.npy')
+        
+        # Hashes include the namespace (the model name) so switching models
+        # never returns embeddings from a different vector space
+        self.namespace = namespace.encode('utf-8') + b'\0'
+        
+        self.embeddings = None
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.rows: Dict[int, int] = {}
+        self.pending: Dict[int, np.ndarray] = {}
+        
+        if os.path.exists(self.embeddings_path) and os.path.exists(self.keys_path):
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+            keys = np.load(self.keys_path)
+            
+            # Ignore files left out of step by an interrupted write
+            if len(embeddings) == len(keys):
+                self.embeddings = embeddings
+                self.keys = keys
+                self.rows = {int(key): row for row, key in enumerate(keys)}
+    
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.pending)
+    
+    def key(self, text: str) -> int:
+        """Get the cache key for a chunk of text"""
+        digest = hashlib.blake2b(self.namespace + text.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+    
+    def get_or_create(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Get embeddings for texts, encoding only those not already cached"""
+        keys = [self.key(text) for text in texts]
+        
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.rows and key not in self.pending:
+                missing[key] = text
+        
+        if missing:
+            self.pending.update(zip(missing, encode(list(missing.values())).astype(np.float16)))
+        
+        return np.stack([
+            self.pending[key] if key in self.pending else self.embeddings[self.rows[key]]
+            for key in keys
+        ])
+    
+    def flush(self):
+        """Write embeddings added since the last flush to the cache files"""
+        if not self.pending:
+            return
+        
+        embeddings = np.stack(list(self.pending.values()))
+        if self.embeddings is not None:
+            embeddings = np.concatenate([self.embeddings, embeddings])
+        keys = np.concatenate([self.keys, np.fromiter(self.pending, dtype=np.uint64, count=len(self.pending))])
+        
+        # Write to temporary files first so the mapped file is never truncated in place
+        os.makedirs(os.path.dirname(self.embeddings_path) or '.', exist_ok=True)
+        for path, array in ((self.embeddings_path, embeddings), (self.keys_path, keys)):
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(path + '.tmp', path)
+        
+        self.embeddings = np.load(self.embeddings_path, mmap_mode='r')
+        self.keys = keys
+        start = len(self.rows)
+        self.rows.update((int(key), row) for row, key in enumerate(keys[start:], start=start))
+        self.pending.clear()
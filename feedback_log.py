@@ -0,0 +1,46 @@
+"""
+Buffered JSON Lines log of user feedback for PMC chatbots
+"""
+import atexit
+import logging
+import logging.handlers
+import orjson
+import os
+import queue
+import threading
+from typing import Any, Dict
+
+FEEDBACK_LOG_PATH = 'data/feedback.jsonl'
+
+_feedback_logger = logging.getLogger('pmc_feedback')
+_listener = None
+_lock = threading.Lock()
+
+def _get_feedback_logger() -> logging.Logger:
+    """Start the background writer on first use"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            os.makedirs(os.path.dirname(FEEDBACK_LOG_PATH), exist_ok=True)
+
+            # The file is opened once and written from the listener thread,
+            # so callers only pay for putting a record on the queue
+            handler = logging.FileHandler(FEEDBACK_LOG_PATH, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, handler)
+            _listener.start()
+
+            # Stopping the listener drains any queued records
+            atexit.register(_listener.stop)
+
+            _feedback_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            _feedback_logger.setLevel(logging.INFO)
+            _feedback_logger.propagate = False
+
+    return _feedback_logger
+
+def log_feedback(feedback_data: Dict[str, Any]):
+    """Queue a feedback record to be appended to the feedback log"""
+    _get_feedback_logger().info(orjson.dumps(feedback_data).decode('utf-8'))
@@ -5,19 +5,42 @@ import subprocess
 import sys
 import os
 
+# Heavy packages that should never fall back to a source build
+BINARY_ONLY_PACKAGES = ["faiss-cpu", "chromadb"]
+
+def pip_install(packages):
+    """Run a single pip invocation for the given packages"""
+    subprocess.check_call([
+        sys.executable, "-m", "pip", "install", "--prefer-binary",
+        f"--only-binary={','.join(BINARY_ONLY_PACKAGES)}", *packages
+    ])
+
 def install_package(package_name):
     """Install a single package"""
     try:
         print(f"Installing {package_name}...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
+        pip_install([package_name])
         print(f"✅ {package_name} installed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Error installing {package_name}: {e}")
         return False
 
+def install_packages(packages):
+    """Install a group of packages with one pip invocation, returning any that failed"""
+    try:
+        print(f"Installing {', '.join(packages)}...")
+        pip_install(packages)
+        print("✅ Packages installed successfully")
+        return []
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error installing packages together: {e}")
+    
+    # Retry one by one so a single failure doesn't block the rest
+    return [package for package in packages if not install_package(package)]
+
 def main():
-    """Install packages step by step"""
+    """Install packages in batches"""
     print("🚀 Installing PMC Chatbot Dependencies")
     print("=" * 50)
     
@@ -25,8 +48,11 @@ def main():
     core_packages = [
         "flask",
         "requests", 
+        "httpx[http2]",
         "beautifulsoup4",
+        "lxml",
         "python-dotenv",
+        "orjson",
         "flask-cors"
     ]
     
@@ -35,7 +61,8 @@ def main():
         "openai",
         "numpy",
         "pandas",
-        "streamlit"
+        "streamlit",
+        "tiktoken"
     ]
     
     # Optional packages (may fail but won't break the app)
@@ -44,24 +71,17 @@ def main():
         "sentence-transformers",
         "langchain",
         "langchain-openai",
-        "tiktoken",
-        "faiss-cpu"
+        "faiss-cpu",
+        "simsimd",
+        "optimum[onnxruntime]"
     ]
     
-    print("Installing core packages...")
-    for package in core_packages:
-        install_package(package)
-    
-    print("\nInstalling AI/ML packages...")
-    for package in ai_packages:
-        install_package(package)
+    print("Installing core and AI/ML packages...")
+    install_packages(core_packages + ai_packages)
     
     print("\nInstalling optional packages...")
-    for package in optional_packages:
-        try:
-            install_package(package)
-        except:
-            print(f"⚠️  {package} failed to install - will use fallback")
+    for package in install_packages(optional_packages):
+        print(f"⚠️  {package} failed to install - will use fallback")
     
     print("\n" + "=" * 50)
     print("✅ Package installation completed!")
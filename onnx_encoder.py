@@ -0,0 +1,84 @@
+"""
+Int8-quantized ONNX embedding model for CPU inference
+"""
+import os
+from typing import List
+import numpy as np
+
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+except ImportError:
+    onnxruntime = None
+
+QUANTIZED_MODEL_FILE = 'model_quantized.onnx'
+
+def is_available() -> bool:
+    """Check whether the ONNX runtime dependencies are installed"""
+    return onnxruntime is not None
+
+def export_quantized_model(model_name: str, directory: str) -> str:
+    """Export a sentence-transformers model to ONNX and quantize its weights to int8"""
+    quantized_path = os.path.join(directory, QUANTIZED_MODEL_FILE)
+    if os.path.exists(quantized_path):
+        return quantized_path
+    
+    # Exporting needs optimum, which is only required the first time
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(directory)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(directory)
+    
+    quantize_dynamic(
+        os.path.join(directory, 'model.onnx'), quantized_path,
+        weight_type=QuantType.QInt8
+    )
+    return quantized_path
+
+class OnnxEncoder:
+    """Mean-pooled sentence embeddings from a quantized ONNX model.
+    
+    Exposes the subset of the SentenceTransformer.encode interface used by
+    the vector store, so it can stand in for the PyTorch model on CPU.
+    """
+    
+    def __init__(self, model_name: str, directory: str, max_seq_length: int = 256):
+        if '/' not in model_name:
+            model_name = f"sentence-transformers/{model_name}"
+        
+        # Each model gets its own directory so changing models never loads a stale export
+        directory = os.path.join(directory, model_name.replace('/', '__'))
+        
+        model_path = export_quantized_model(model_name, directory)
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.max_seq_length = max_seq_length
+    
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False) -> np.ndarray:
+        """Encode texts into a (len(texts), dim) float32 array"""
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors='np'
+            )
+            feeds = {name: array.astype(np.int64) for name, array in inputs.items()
+                     if name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            
+            # Average the token embeddings, ignoring padding
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            batches.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        
+        embeddings = np.concatenate(batches).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
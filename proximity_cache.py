@@ -0,0 +1,88 @@
+"""
+Approximate semantic cache for PMC chatbot responses
+"""
+from collections import deque
+from typing import Any, Deque, List, Optional, Tuple
+import numpy as np
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+def _quantize(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Quantize a vector to int8 with a single symmetric scale"""
+    scale = float(np.max(np.abs(vector))) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+class ProximityCache:
+    """Key-value cache keyed on query embeddings.
+
+    A lookup hits when the nearest cached key lies within `tolerance` cosine
+    distance of the query. Keys are L2-normalized embeddings stored as int8
+    with a per-row scale, and are scanned with SimSIMD when it is installed.
+    When full, the least recently used slot is overwritten.
+    """
+    
+    def __init__(self, capacity: int = 1024, tolerance: float = 0.05):
+        self.capacity = capacity
+        self.tolerance = tolerance
+        
+        # Keys are allocated on first insert, once the embedding size is known
+        self.keys: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.values: List[Tuple[str, Any]] = []
+        
+        # Slot indices ordered from least to most recently used
+        self.lru: Deque[int] = deque()
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def get(self, query_embedding: np.ndarray) -> Optional[Tuple[str, Any]]:
+        """Return the cached value for the nearest key within tolerance"""
+        if not self.values:
+            return None
+        
+        distances = self._distances(*_quantize(query_embedding))
+        slot = int(np.argmin(distances))
+        if distances[slot] > self.tolerance:
+            return None
+        
+        self.lru.remove(slot)
+        self.lru.append(slot)
+        return self.values[slot]
+    
+    def _distances(self, query: np.ndarray, query_scale: float) -> np.ndarray:
+        """Cosine distance from the quantized query to every cached key"""
+        keys = self.keys[:len(self.values)]
+        if simsimd is not None:
+            return np.asarray(simsimd.cdist(query[None, :], keys, metric="cosine"))[0]
+        
+        # Accumulate in int32 so int8 products cannot overflow, then rescale;
+        # the original vectors are unit length, so the dot product is the cosine
+        dots = keys.astype(np.int32) @ query.astype(np.int32)
+        return 1 - dots * self.scales[:len(self.values)] * query_scale
+    
+    def put(self, query_embedding: np.ndarray, value: Tuple[str, Any]):
+        """Store a value, evicting the least recently used entry when full"""
+        if self.keys is None:
+            self.keys = np.empty((self.capacity, query_embedding.shape[0]), dtype=np.int8)
+            self.scales = np.empty(self.capacity, dtype=np.float32)
+        
+        if len(self.values) < self.capacity:
+            slot = len(self.values)
+            self.values.append(value)
+        else:
+            slot = self.lru.popleft()
+            self.values[slot] = value
+        
+        self.keys[slot], self.scales[slot] = _quantize(query_embedding)
+        self.lru.append(slot)
+    
+    def clear(self):
+        """Remove all cached entries"""
+        self.keys = None
+        self.scales = None
+        self.values.clear()
+        self.lru.clear()
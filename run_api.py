@@ -4,6 +4,7 @@ Script to run the PMC Chatbot API server
 import subprocess
 import sys
 import os
+import runpy
 
 def main():
     """Run the Flask API server"""
@@ -31,9 +32,9 @@ def main():
     print("=" * 50)
     
     try:
-        subprocess.run([
-            sys.executable, "api/app.py"
-        ])
+        # Run the app as __main__ in this process instead of spawning a new interpreter
+        sys.path.insert(0, os.path.abspath("api"))
+        runpy.run_path("api/app.py", run_name="__main__")
     except KeyboardInterrupt:
         print("\n👋 API server stopped by user")
     except Exception as e:
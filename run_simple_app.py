@@ -30,6 +30,15 @@ def main():
             print("❌ env_example.txt not found")
             return
     
+    # Cache answers to the suggested questions before the app starts; they are
+    # written through to the on-disk response cache, so the app reuses them
+    try:
+        import asyncio
+        from simple_chatbot import SimplePMCChatbot
+        asyncio.run(SimplePMCChatbot().prewarm())
+    except (ImportError, ValueError) as e:
+        print(f"⚠️  Skipping response prewarm: {e}")
+    
     # Run the simplified web application
     print("🌐 Starting simplified web application...")
     print("The application will open in your browser at http://localhost:8501")
@@ -37,8 +46,10 @@ def main():
     print("=" * 60)
     
     try:
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "web_app/simple_app.py",
+        # Run Streamlit's CLI in this process instead of spawning a new interpreter
+        from streamlit.web import cli as streamlit_cli
+        streamlit_cli.main([
+            "run", "web_app/simple_app.py",
             "--server.port", "8501",
             "--server.address", "localhost"
         ])
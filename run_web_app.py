@@ -30,9 +30,19 @@ def main():
     print("Press Ctrl+C to stop the application")
     print("=" * 50)
     
+    # Load the embedding model and vector database before the first request;
+    # Streamlit runs in this process, so the app reuses them
     try:
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "web_app/app.py",
+        from vector_store import warmup
+        warmup()
+    except ImportError as e:
+        print(f"⚠️  Skipping vector store warmup: {e}")
+    
+    try:
+        # Run Streamlit's CLI in this process instead of spawning a new interpreter
+        from streamlit.web import cli as streamlit_cli
+        streamlit_cli.main([
+            "run", "web_app/app.py",
             "--server.port", "8501",
             "--server.address", "localhost"
         ])
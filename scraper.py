@@ -1,19 +1,87 @@
 """
 Web scraper for PMC (Prime Minister's Office) website
 """
-import requests
-from bs4 import BeautifulSoup
-import time
+import asyncio
+import httpx
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
 import urllib.parse
 from typing import List, Dict, Any, Set
 import os
+import sqlite3
+import time
 from utils import (
     setup_logging, clean_text, chunk_text, save_data, 
-    get_config, validate_config, extract_metadata
+    get_config, validate_config, extract_metadata, canonicalize_url, resolve_data_file
 )
 
 logger = setup_logging()
 
+# Upper bounds on in-flight requests and pooled connections while crawling
+MAX_CONCURRENT_REQUESTS = 8
+MAX_CONNECTIONS = 16
+
+# Elements whose text is never page content
+SKIP_TAGS = {"script", "style", "nav", "footer", "header"}
+
+# Markers of the main content of a page, as (attribute, value) pairs in
+# priority order; text comes from the first kind that appears on the page
+CONTENT_SELECTORS = [
+    ('name', 'main'), ('name', 'article'), ('class', 'content'), ('class', 'main-content'),
+    ('id', 'content'), ('id', 'main'), ('class', 'post-content'), ('class', 'entry-content')
+]
+
+def content_priorities(elem: Tag) -> List[int]:
+    """Get the priorities of the content selectors an element matches"""
+    classes = elem.get('class') or ()
+    priorities = []
+    for priority, (attribute, value) in enumerate(CONTENT_SELECTORS):
+        if attribute == 'name':
+            matched = elem.name == value
+        elif attribute == 'id':
+            matched = elem.get('id') == value
+        else:
+            matched = value in classes
+        if matched:
+            priorities.append(priority)
+    return priorities
+
+class PageCache:
+    """SQLite store of fetched pages used for conditional re-fetching"""
+    
+    def __init__(self, path: str, expire_after: float):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.expire_after = expire_after
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, content BLOB, etag TEXT, last_modified TEXT, fetched_at REAL)"
+        )
+    
+    def get(self, url: str) -> Dict[str, Any] | None:
+        """Get the cached copy of a page"""
+        row = self.connection.execute(
+            "SELECT content, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        content, etag, last_modified, fetched_at = row
+        return {
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': time.time() - fetched_at < self.expire_after
+        }
+    
+    def put(self, url: str, content: bytes, etag: str | None, last_modified: str | None):
+        """Store a page along with its validators"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (url, content, etag, last_modified, time.time())
+        )
+        self.connection.commit()
+
 class PMCScraper:
     def __init__(self):
         self.config = get_config()
@@ -24,55 +92,105 @@ class PMCScraper:
         self.max_pages = self.config['max_pages']
         self.request_delay = self.config['request_delay']
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
         
         self.visited_urls: Set[str] = set()
         self.scraped_data: List[Dict[str, Any]] = []
         
-    def get_page_content(self, url: str) -> BeautifulSoup | None:
+        # Limits concurrent fetches across all pages of a crawl
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        # Pages from earlier runs, revalidated with ETag/Last-Modified once stale
+        self.page_cache = PageCache(self.config['http_cache_path'], self.config['http_cache_expire_after'])
+        
+    async def get_page_content(self, client: httpx.AsyncClient, url: str) -> BeautifulSoup | None:
         """Fetch and parse page content"""
-        try:
-            logger.info(f"Fetching: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            time.sleep(self.request_delay)
-            return soup
+        cached = self.page_cache.get(url)
+        
+        if cached and cached['fresh']:
+            # Local hit: no request, so no politeness delay either
+            logger.info(f"Using cached copy of: {url}")
+            content = cached['content']
+        else:
+            headers = {}
+            if cached and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached and cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
             
-        except requests.RequestException as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return None
+            async with self.semaphore:
+                try:
+                    logger.info(f"Fetching: {url}")
+                    response = await client.get(url, headers=headers, timeout=30)
+                    
+                    if cached and response.status_code == 304:
+                        content = cached['content']
+                    else:
+                        response.raise_for_status()
+                        content = response.content
+                    
+                    self.page_cache.put(
+                        url, content,
+                        response.headers.get('ETag') or (cached and cached['etag']),
+                        response.headers.get('Last-Modified') or (cached and cached['last_modified'])
+                    )
+                    
+                    # Hold the slot for the politeness delay so the overall
+                    # request rate stays bounded by the semaphore size
+                    await asyncio.sleep(self.request_delay)
+                    
+                except httpx.HTTPError as e:
+                    logger.error(f"Error fetching {url}: {e}")
+                    return None
+        
+        # Parse in a worker thread so it overlaps with other fetches; lxml
+        # works on the raw bytes and detects the encoding itself
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, BeautifulSoup, content, 'lxml')
     
     def extract_text_content(self, soup: BeautifulSoup) -> str:
         """Extract main text content from page"""
         if not soup:
             return ""
         
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
+        # Walk the tree once, skipping boilerplate subtrees and collecting the
+        # text of every content container (nested ones included) as it goes
+        all_parts = []
+        containers = []
+        stack = [(soup, ())]
         
-        # Find main content areas
-        content_selectors = [
-            'main', 'article', '.content', '.main-content', 
-            '#content', '#main', '.post-content', '.entry-content'
-        ]
+        while stack:
+            node, open_containers = stack.pop()
+            
+            if isinstance(node, NavigableString):
+                if not isinstance(node, PreformattedString):  # Comments, doctypes, etc.
+                    all_parts.append(node)
+                    for parts in open_containers:
+                        parts.append(node)
+                continue
+            
+            if node.name in SKIP_TAGS:
+                continue
+            
+            priorities = content_priorities(node)
+            if priorities:
+                parts = []
+                containers.extend((priority, parts) for priority in priorities)
+                open_containers = open_containers + (parts,)
+            
+            stack.extend((child, open_containers) for child in reversed(node.contents))
         
+        # Use the containers of the highest-priority kind found, in document order
         content = ""
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                content = " ".join([elem.get_text() for elem in elements])
-                break
+        if containers:
+            best = min(priority for priority, _ in containers)
+            content = " ".join("".join(parts) for priority, parts in containers if priority == best)
         
-        # If no main content found, get body text
+        # If no main content found, use all page text
         if not content:
-            content = soup.get_text()
+            content = "".join(all_parts)
         
         return clean_text(content)
     
@@ -82,10 +200,12 @@ class PMCScraper:
             return ""
         
         # Try different title selectors
-        title_selectors = ['h1', '.title', '.page-title', 'title']
+        title_selectors = [
+            {'name': 'h1'}, {'class_': 'title'}, {'class_': 'page-title'}, {'name': 'title'}
+        ]
         
         for selector in title_selectors:
-            element = soup.select_one(selector)
+            element = soup.find(**selector)
             if element:
                 title = element.get_text().strip()
                 if title:
@@ -115,23 +235,15 @@ class PMCScraper:
                 continue
             
             # Clean URL
-            href = urllib.parse.urljoin(base_url, href)
+            href = canonicalize_url(urllib.parse.urljoin(base_url, href))
             if href not in self.visited_urls:
                 links.append(href)
         
-        return list(set(links))
+        # Deduplicate while keeping discovery order
+        return list(dict.fromkeys(links))
     
-    def scrape_page(self, url: str) -> Dict[str, Any] | None:
-        """Scrape a single page"""
-        if url in self.visited_urls:
-            return None
-        
-        self.visited_urls.add(url)
-        
-        soup = self.get_page_content(url)
-        if not soup:
-            return None
-        
+    def build_page_data(self, url: str, soup: BeautifulSoup) -> Dict[str, Any] | None:
+        """Extract title, content and chunks from a parsed page"""
         title = self.extract_title(soup)
         content = self.extract_text_content(soup)
         
@@ -152,35 +264,60 @@ class PMCScraper:
         logger.info(f"Scraped: {title} ({len(content)} characters, {len(chunks)} chunks)")
         return page_data
     
-    def scrape_website(self) -> List[Dict[str, Any]]:
-        """Main scraping function"""
+    async def scrape_page(self, client: httpx.AsyncClient, url: str) -> Dict[str, Any] | None:
+        """Scrape a single page"""
+        if url in self.visited_urls:
+            return None
+        
+        self.visited_urls.add(url)
+        
+        soup = await self.get_page_content(client, url)
+        if not soup:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.build_page_data, url, soup)
+    
+    async def scrape_website_async(self) -> List[Dict[str, Any]]:
+        """Scrape the main page, then its linked pages concurrently"""
         logger.info(f"Starting to scrape {self.base_url}")
         
-        # Start with the main page
-        main_page = self.scrape_page(self.base_url)
-        if main_page:
-            self.scraped_data.append(main_page)
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS)
         
-        # Get links from main page
-        soup = self.get_page_content(self.base_url)
-        if soup:
-            links = self.extract_links(soup, self.base_url)
+        async with httpx.AsyncClient(http2=True, limits=limits, headers=self.headers,
+                                     follow_redirects=True) as client:
+            # Start with the main page
+            self.visited_urls.add(canonicalize_url(self.base_url))
+            soup = await self.get_page_content(client, self.base_url)
             
-            # Scrape linked pages
-            for i, link in enumerate(links[:self.max_pages]):
-                if len(self.scraped_data) >= self.max_pages:
-                    break
+            if soup:
+                # Collect links before content extraction strips nav/header/footer
+                links = self.extract_links(soup, self.base_url)
+                
+                main_page = self.build_page_data(self.base_url, soup)
+                if main_page:
+                    self.scraped_data.append(main_page)
                 
-                page_data = self.scrape_page(link)
-                if page_data:
-                    self.scraped_data.append(page_data)
+                # Scrape linked pages
+                pages = await asyncio.gather(
+                    *[self.scrape_page(client, link) for link in links[:self.max_pages]]
+                )
+                for page_data in pages:
+                    if len(self.scraped_data) >= self.max_pages:
+                        break
+                    if page_data:
+                        self.scraped_data.append(page_data)
                 
                 logger.info(f"Progress: {len(self.scraped_data)}/{self.max_pages} pages scraped")
         
         logger.info(f"Scraping completed. Total pages: {len(self.scraped_data)}")
         return self.scraped_data
     
-    def save_scraped_data(self, filename: str = "data/pmc_scraped_data.json"):
+    def scrape_website(self) -> List[Dict[str, Any]]:
+        """Main scraping function"""
+        return asyncio.run(self.scrape_website_async())
+    
+    def save_scraped_data(self, filename: str = "data/pmc_scraped_data.jsonl"):
         """Save scraped data to file"""
         save_data(self.scraped_data, filename)
         logger.info(f"Data saved to {filename}")
@@ -211,7 +348,7 @@ def main():
         scraper = PMCScraper()
         
         # Check if data already exists
-        if os.path.exists("data/pmc_scraped_data.json"):
+        if os.path.exists(resolve_data_file("data/pmc_scraped_data.jsonl")):
             print("Scraped data already exists. Use existing data or delete to re-scrape.")
             return
         
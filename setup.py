@@ -50,6 +50,19 @@ def create_env_file():
         print("❌ env_example.txt not found")
         return False
 
+def compile_utils():
+    """Compile utils.py to a native extension with mypyc"""
+    print("Compiling utils.py with mypyc...")
+    try:
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "mypy"])
+        subprocess.check_call([sys.executable, "-m", "mypyc", "utils.py"])
+        print("✅ utils.py compiled")
+        print("⚠️  The compiled module takes precedence over utils.py; delete the utils.*.so file after editing utils.py")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error compiling utils.py: {e}")
+        return False
+
 def run_scraper():
     """Run the web scraper"""
     print("Running web scraper...")
@@ -90,13 +103,19 @@ def main():
         print("❌ Setup failed at environment setup")
         return False
     
-    # Step 4: Run scraper (optional)
+    # Step 4: Compile text utilities (optional)
+    compile_choice = input("\nDo you want to compile utils.py with mypyc for faster scraping? (y/n): ").lower().strip()
+    if compile_choice == 'y':
+        if not compile_utils():
+            print("⚠️  Compilation failed, the pure Python utils.py will be used")
+    
+    # Step 5: Run scraper (optional)
     run_scraper_choice = input("\nDo you want to run the web scraper now? (y/n): ").lower().strip()
     if run_scraper_choice == 'y':
         if not run_scraper():
             print("⚠️  Scraper failed, but setup can continue")
     
-    # Step 5: Test chatbot (optional)
+    # Step 6: Test chatbot (optional)
     test_choice = input("\nDo you want to test the chatbot? (y/n): ").lower().strip()
     if test_choice == 'y':
         if not test_chatbot():
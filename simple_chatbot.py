@@ -1,16 +1,163 @@
 """
 Simplified chatbot for PMC website (no complex dependencies)
 """
+import asyncio
+import httpx
 import openai
-from typing import List, Dict, Any
-import json
+import threading
+import tiktoken
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Iterator, List, Dict, Any, Optional, TypeVar
+import orjson
+import hashlib
+import sqlite3
+import time
+import uuid
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from feedback_log import log_feedback
 
 # Load environment variables
 load_dotenv()
 
+# Connection pool for the OpenAI API, sized for many concurrent sessions
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=100)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Answers to identical requests, least recently used first
+RESPONSE_CACHE_SIZE = 1024
+_response_cache: "OrderedDict[str, str]" = OrderedDict()
+
+# On-disk copy of the response cache, shared across processes and restarts
+RESPONSE_CACHE_PATH = 'data/response_cache.sqlite'
+RESPONSE_CACHE_EXPIRE_AFTER = 86400
+_disk_cache: Optional[sqlite3.Connection] = None
+
+def _get_disk_cache() -> sqlite3.Connection:
+    """Open the on-disk response cache, creating it on first use"""
+    global _disk_cache
+    if _disk_cache is None:
+        os.makedirs(os.path.dirname(RESPONSE_CACHE_PATH), exist_ok=True)
+        _disk_cache = sqlite3.connect(RESPONSE_CACHE_PATH, check_same_thread=False)
+        _disk_cache.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+        )
+        
+        # Reads already skip expired rows; deleting them here keeps the file from growing forever
+        _disk_cache.execute(
+            "DELETE FROM responses WHERE created_at <= ?",
+            (time.time() - RESPONSE_CACHE_EXPIRE_AFTER,)
+        )
+        _disk_cache.commit()
+    return _disk_cache
+
+# Scraped pages used to extend the static prompt prefix past OpenAI's
+# 1024-token prompt caching threshold
+REFERENCE_DATA_PATH = 'data/pmc_scraped_data.jsonl'
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+@lru_cache(maxsize=None)
+def load_reference_chunks(path: str = REFERENCE_DATA_PATH) -> tuple:
+    """Load scraped PMO text chunks in a deterministic order"""
+    # Scrapes saved before the switch to JSON Lines are a single JSON array
+    legacy_path = path[:-1] if path.endswith('.jsonl') else None
+    if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+        with open(legacy_path, 'rb') as f:
+            pages = orjson.loads(f.read())
+    elif os.path.exists(path):
+        with open(path, 'rb') as f:
+            pages = [orjson.loads(line) for line in f if line.strip()]
+    else:
+        return ()
+    
+    # Fixed page order and normalized whitespace keep the text byte-identical across processes
+    return tuple(
+        " ".join(chunk.split())
+        for page in sorted(pages, key=lambda page: page.get('url', ''))
+        for chunk in page.get('chunks', [])
+    )
+
+# Example exchanges sent after the system prompt to set the answer style
+FEW_SHOT_EXAMPLES = [
+    (
+        "What does the PMO do?",
+        "The Prime Minister's Office (PMO) provides secretarial assistance to the Prime Minister of India. "
+        "It coordinates between ministries and departments, handles important policy matters and government "
+        "initiatives, and manages the Prime Minister's schedule and official communications."
+    ),
+    (
+        "What is the Prime Minister doing tomorrow?",
+        "I don't have access to the Prime Minister's upcoming schedule. Official engagements are announced "
+        "on the PMO website and its official social media channels, so those are the best places to check."
+    )
+]
+
+# Tokens of conversation history sent with each request
+HISTORY_TOKEN_BUDGET = 2000
+
+# Concurrent API requests while prewarming suggested questions
+PREWARM_CONCURRENCY = 5
+
+# Long-lived event loop that runs requests for synchronous callers, so the
+# client's pooled connections outlive any single call
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_event_loop_lock = threading.Lock()
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop on first use"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name='simple-chatbot-loop', daemon=True).start()
+    return _event_loop
+
+T = TypeVar('T')
+
+async def _run_on_event_loop(awaitable: Awaitable[T]) -> T:
+    """Await on the background event loop, whichever loop the caller is running in"""
+    loop = _get_event_loop()
+    if asyncio.get_running_loop() is loop:
+        return await awaitable
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_await(awaitable), loop))
+
+async def _await(awaitable: Awaitable[T]) -> T:
+    """Wrap an awaitable in a coroutine so it can be scheduled on another loop"""
+    return await awaitable
+
+# Marks the end of a stream relayed from the background event loop
+_STREAM_END = object()
+
+async def _next_part(parts: AsyncIterator[str]) -> Any:
+    """Get the next item of an async iterator, or _STREAM_END once it is exhausted"""
+    try:
+        return await parts.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_END
+
+# OpenAI client shared by every chatbot in the process; it is only ever used
+# on the background event loop, which its pooled connections belong to
+_client: Optional[openai.AsyncOpenAI] = None
+
+def _get_client(api_key: str) -> openai.AsyncOpenAI:
+    """Get the process-wide OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        )
+    return _client
+
+async def _close_client():
+    """Close the process-wide OpenAI client; the next request opens a new one"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
 class SimplePMCChatbot:
     def __init__(self):
         # Get configuration
@@ -22,11 +169,15 @@ class SimplePMCChatbot:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY is required. Please set it in your .env file")
         
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=self.openai_api_key)
+        # Tokenizer for sizing the history window
+        try:
+            self.encoding = tiktoken.encoding_for_model(self.model_name)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
         
-        # Chat history
+        # Chat history, with the token count of each message kept alongside
         self.conversation_history: List[Dict[str, str]] = []
+        self.history_tokens: List[int] = []
         
         # System prompt with PMC knowledge
         self.system_prompt = """You are an AI assistant for the Prime Minister's Office (PMO) website. Your role is to help users find information about:
@@ -52,50 +203,208 @@ Key guidelines:
 - If asked about something not in your knowledge, say you don't have that specific information
 - Be concise but informative
 - Respond in a helpful and friendly manner"""
+        
+        # Append static reference text until the shared prompt prefix is long
+        # enough to be cached; nothing per-request ever goes in here
+        prefix_tokens = len(self.encoding.encode(self.system_prompt)) + sum(
+            len(self.encoding.encode(text)) for example in FEW_SHOT_EXAMPLES for text in example
+        )
+        reference_chunks = []
+        for chunk in load_reference_chunks():
+            if prefix_tokens >= PROMPT_CACHE_MIN_TOKENS:
+                break
+            reference_chunks.append(chunk)
+            prefix_tokens += len(self.encoding.encode(chunk))
+        if reference_chunks:
+            self.system_prompt += "\n\nReference information from the PMO website:\n\n" + "\n\n".join(reference_chunks)
+        
+        # Messages identical for every user and request; per-user turns always
+        # follow them, so the whole block can be served from the prompt cache
+        self.static_prefix_messages = [{"role": "system", "content": self.system_prompt}]
+        for question, answer in FEW_SHOT_EXAMPLES:
+            self.static_prefix_messages.append({"role": "user", "content": question})
+            self.static_prefix_messages.append({"role": "assistant", "content": answer})
+        
+        prefix_tokens = sum(len(self.encoding.encode(message["content"])) for message in self.static_prefix_messages)
+        if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            print(f"Warning: static prompt prefix is {prefix_tokens} tokens, below the "
+                  f"{PROMPT_CACHE_MIN_TOKENS}-token prompt caching threshold; "
+                  f"scrape more pages into {REFERENCE_DATA_PATH}")
+        
+        # Routing hints for OpenAI prompt caching: a key shared by every user of
+        # this prefix and a per-session user id
+        self.prompt_cache_key = hashlib.sha1(orjson.dumps(self.static_prefix_messages)).hexdigest()[:32]
+        self.session_id = uuid.uuid4().hex
     
-    def get_response(self, user_message: str, use_context: bool = True) -> Dict[str, Any]:
-        """Generate a response to user message"""
-        try:
-            # Add user message to history
-            self.conversation_history.append({
-                'role': 'user',
-                'content': user_message,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Build messages for OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation history (last 6 messages to avoid token limits)
-            recent_history = self.conversation_history[-6:]  # Last 6 messages
-            for msg in recent_history:
-                if msg['role'] == 'user':
-                    messages.append({"role": "user", "content": msg['content']})
-                elif msg['role'] == 'assistant':
-                    messages.append({"role": "assistant", "content": msg['content']})
+    def _add_to_history(self, role: str, content: str):
+        """Append a message to history, counting its tokens once"""
+        self.conversation_history.append({
+            'role': role,
+            'content': content,
+            'timestamp': datetime.now().isoformat()
+        })
+        self.history_tokens.append(len(self.encoding.encode(content)))
+    
+    def _recent_history(self) -> List[Dict[str, str]]:
+        """Get the most recent history messages that fit in the token budget"""
+        recent_history: List[Dict[str, str]] = []
+        total_tokens = 0
+        
+        for msg, tokens in zip(reversed(self.conversation_history), reversed(self.history_tokens)):
+            # Always keep the latest message, even if it alone exceeds the budget
+            if recent_history and total_tokens + tokens > HISTORY_TOKEN_BUDGET:
+                break
             
-            # Generate response
-            response = self.client.chat.completions.create(
+            total_tokens += tokens
+            recent_history.append({"role": msg['role'], "content": msg['content']})
+        
+        recent_history.reverse()
+        return recent_history
+    
+    def _build_messages(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Build messages for OpenAI from the static prefix and conversation turns"""
+        return self.static_prefix_messages + history
+    
+    async def _stream_completion(self, messages: List[Dict[str, str]],
+                                 usage: Dict[str, int]) -> AsyncIterator[str]:
+        """Stream a completion, replaying identical earlier answers from the cache.
+        
+        Prompt tokens served from OpenAI's cache are recorded in the caller's
+        `usage` dict, so concurrent completions never see each other's counts.
+        """
+        usage['cached_tokens'] = 0
+        key = hashlib.sha256(orjson.dumps({
+            'm': self.model_name,
+            't': self.temperature,
+            'mx': self.max_tokens,
+            'msgs': messages
+        }, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        
+        if key in _response_cache:
+            _response_cache.move_to_end(key)
+            yield _response_cache[key]
+            return
+        
+        disk_cache = _get_disk_cache()
+        row = disk_cache.execute(
+            "SELECT response FROM responses WHERE key = ? AND created_at > ?",
+            (key, time.time() - RESPONSE_CACHE_EXPIRE_AFTER)
+        ).fetchone()
+        
+        if row:
+            assistant_message = row[0]
+            yield assistant_message
+        else:
+            stream = await _get_client(self.openai_api_key).chat.completions.create(
                 model=self.model_name,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens
+                max_tokens=self.max_tokens,
+                user=self.session_id,
+                stream=True,
+                stream_options={'include_usage': True},
+                extra_body={'prompt_cache_key': self.prompt_cache_key}
             )
             
-            assistant_message = response.choices[0].message.content or ""
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+                
+                # Usage arrives on a final chunk with no choices
+                details = chunk.usage.prompt_tokens_details if chunk.usage else None
+                if details and details.cached_tokens:
+                    usage['cached_tokens'] = details.cached_tokens
             
-            # Add assistant response to history
-            self.conversation_history.append({
-                'role': 'assistant',
-                'content': assistant_message,
-                'timestamp': datetime.now().isoformat()
-            })
+            assistant_message = "".join(parts)
+            if assistant_message:
+                disk_cache.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    (key, assistant_message, time.time())
+                )
+                disk_cache.commit()
+        
+        if assistant_message:
+            _response_cache[key] = assistant_message
+            if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+    
+    async def _stream_turn(self, user_message: str, usage: Dict[str, int]) -> AsyncIterator[str]:
+        """Stream the answer to a user message and record both in history"""
+        # Add user message to history
+        self._add_to_history('user', user_message)
+        
+        # Add as much recent conversation history as fits the token budget
+        messages = self._build_messages(self._recent_history())
+        
+        parts = []
+        async for part in self._stream_completion(messages, usage):
+            parts.append(part)
+            yield part
+        
+        # Add assistant response to history once the stream is complete
+        self._add_to_history('assistant', "".join(parts))
+    
+    async def stream_response(self, user_message: str, use_context: bool = True) -> AsyncIterator[str]:
+        """Generate a response to user message, yielding text as it arrives"""
+        # The stream runs on the background loop and its parts are relayed here
+        parts = self._stream_response(user_message)
+        try:
+            while True:
+                part = await _run_on_event_loop(_next_part(parts))
+                if part is _STREAM_END:
+                    break
+                yield part
+        finally:
+            await _run_on_event_loop(parts.aclose())
+    
+    def stream_response_sync(self, user_message: str, use_context: bool = True) -> Iterator[str]:
+        """Generate a response to user message, yielding text as it arrives, for synchronous callers"""
+        loop = _get_event_loop()
+        parts = self._stream_response(user_message)
+        try:
+            while True:
+                part = asyncio.run_coroutine_threadsafe(_next_part(parts), loop).result()
+                if part is _STREAM_END:
+                    break
+                yield part
+        finally:
+            asyncio.run_coroutine_threadsafe(_await(parts.aclose()), loop).result()
+    
+    async def _stream_response(self, user_message: str) -> AsyncIterator[str]:
+        """Stream the answer to a user message, apologising if the request fails"""
+        try:
+            async for part in self._stream_turn(user_message, {}):
+                yield part
+            print(f"Streamed response for: {user_message[:50]}...")
+            
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            yield "I apologize, but I'm experiencing technical difficulties. Please try again later."
+    
+    def get_response(self, user_message: str, use_context: bool = True) -> Dict[str, Any]:
+        """Generate a response to user message, blocking until it is complete"""
+        future = asyncio.run_coroutine_threadsafe(self._get_response(user_message), _get_event_loop())
+        return future.result()
+    
+    async def aget_response(self, user_message: str, use_context: bool = True) -> Dict[str, Any]:
+        """Generate a response to user message"""
+        return await _run_on_event_loop(self._get_response(user_message))
+    
+    async def _get_response(self, user_message: str) -> Dict[str, Any]:
+        """Collect the answer to a user message into a response dict"""
+        try:
+            # Collect the streamed answer for callers that want it in one piece
+            usage: Dict[str, int] = {}
+            assistant_message = "".join([part async for part in self._stream_turn(user_message, usage)])
             
             # Prepare response
             response_data = {
                 'response': assistant_message,
                 'context_used': False,  # Simplified version doesn't use vector store
                 'context_length': 0,
+                'cached_tokens': usage['cached_tokens'],
                 'timestamp': datetime.now().isoformat(),
                 'model_used': self.model_name
             }
@@ -112,15 +421,51 @@ Key guidelines:
             }
             return error_response
     
+    async def prewarm(self):
+        """Cache answers to the suggested questions so clicking one is answered instantly"""
+        await _run_on_event_loop(self._prewarm())
+    
+    async def _prewarm(self):
+        """Request every suggested question on the background loop"""
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        
+        async def warm(question: str):
+            # Same messages as a conversation opening with this question, kept out of history
+            messages = self._build_messages([{"role": "user", "content": question}])
+            async with semaphore:
+                async for _ in self._stream_completion(messages, {}):
+                    pass
+        
+        questions = self.get_suggested_questions()
+        results = await asyncio.gather(*[warm(question) for question in questions], return_exceptions=True)
+        
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            print(f"Error prewarming responses: {failures[0]}")
+        print(f"Prewarmed {len(questions) - len(failures)} of {len(questions)} suggested questions")
+    
+    async def aclose(self):
+        """Close the underlying HTTP connections"""
+        await _run_on_event_loop(_close_client())
+    
     def get_conversation_history(self) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return self.conversation_history.copy()
+        """Get conversation history; the list is returned without copying, so callers must not modify it"""
+        return self.conversation_history
     
     def clear_conversation_history(self):
         """Clear conversation history"""
         self.conversation_history.clear()
+        self.history_tokens.clear()
         print("Conversation history cleared")
     
+    def clear_response_cache(self):
+        """Clear cached responses, in memory and on disk"""
+        _response_cache.clear()
+        disk_cache = _get_disk_cache()
+        disk_cache.execute("DELETE FROM responses")
+        disk_cache.commit()
+        print("Response cache cleared")
+    
     def get_system_info(self) -> Dict[str, Any]:
         """Get system information"""
         return {
@@ -157,10 +502,8 @@ Key guidelines:
                 'helpful': feedback.get('helpful', False)
             }
             
-            # Save feedback to file
-            os.makedirs('data', exist_ok=True)
-            with open('data/feedback.json', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(feedback_data, ensure_ascii=False) + '\n')
+            # Queue feedback for the background writer
+            log_feedback(feedback_data)
             
             print(f"Feedback received: rating={feedback.get('rating', 0)}")
             return True
@@ -169,7 +512,7 @@ Key guidelines:
             print(f"Error processing feedback: {e}")
             return False
 
-def main():
+async def main():
     """Test the simplified chatbot"""
     try:
         chatbot = SimplePMCChatbot()
@@ -183,7 +526,7 @@ def main():
         
         for question in test_questions:
             print(f"\nUser: {question}")
-            response = chatbot.get_response(question)
+            response = await chatbot.aget_response(question)
             print(f"Assistant: {response['response']}")
             print(f"Context used: {response['context_used']}")
         
@@ -191,8 +534,10 @@ def main():
         info = chatbot.get_system_info()
         print(f"\nSystem Info: {info}")
         
+        await chatbot.aclose()
+        
     except Exception as e:
         print(f"Error in main: {e}")
 
 if __name__ == "__main__":
-    main() 
+    asyncio.run(main()) 
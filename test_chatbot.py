@@ -108,8 +108,10 @@ def test_data_files():
     """Test if data files exist"""
     print("\n🔍 Testing data files...")
     
+    from utils import resolve_data_file
+    
     files_to_check = [
-        "data/pmc_scraped_data.json",
+        resolve_data_file("data/pmc_scraped_data.jsonl"),
         "models/chroma_db"
     ]
     
@@ -123,6 +125,131 @@ def test_data_files():
     
     return all_exist
 
+def test_text_processing():
+    """Test text cleaning and chunking against known output"""
+    print("\n🔍 Testing text processing...")
+    
+    try:
+        from utils import clean_text, chunk_text
+        
+        cases = [
+            (clean_text("  Hello,\n\t world! <b>PMO</b> @2024 — done (ok); yes?  "),
+             "Hello, world! bPMOb 2024  done (ok); yes?"),
+            (clean_text(""), ""),
+            (chunk_text("Short text", chunk_size=150, overlap=40), ["Short text"]),
+            (chunk_text("x" * 250, chunk_size=150, overlap=40), ["x" * 150, "x" * 140, "x" * 30]),
+            (chunk_text(" ".join(f"Sentence number {i} is here." for i in range(12)), chunk_size=150, overlap=40), [
+                "Sentence number 0 is here. Sentence number 1 is here. Sentence number 2 is here. "
+                "Sentence number 3 is here. Sentence number 4 is here.",
+                "er 3 is here. Sentence number 4 is here. Sentence number 5 is here. Sentence number 6 is here. "
+                "Sentence number 7 is here. Sentence number 8 is here.",
+                "er 7 is here. Sentence number 8 is here. Sentence number 9 is here. "
+                "Sentence number 10 is here. Sentence number 11 is here.",
+                "r 11 is here."
+            ])
+        ]
+        
+        for i, (result, expected) in enumerate(cases):
+            if result != expected:
+                print(f"❌ Case {i}: expected {expected!r}, got {result!r}")
+                return False
+        
+        print(f"✅ Text processing matches expected output ({len(cases)} cases)")
+        return True
+    except Exception as e:
+        print(f"❌ Error testing text processing: {e}")
+        return False
+
+def test_text_extraction():
+    """Test main content extraction from HTML"""
+    print("\n🔍 Testing text extraction...")
+    
+    try:
+        from bs4 import BeautifulSoup
+        from scraper import PMCScraper
+        
+        # Extraction needs no configuration, so skip the scraper's setup
+        scraper = PMCScraper.__new__(PMCScraper)
+        
+        cases = [
+            ("<html><body><main>Hello<b>world</b></main><article>Second</article>"
+             "<div class='content'>Sidebar</div></body></html>", "Helloworld"),
+            ("<html><body><div class='content'>End.</div><div class='content'>Start</div></body></html>",
+             "End. Start"),
+            ("<html><body><form><div id='content'>Inside form content here</div></form></body></html>",
+             "Inside form content here"),
+            ("<html><head><title>T</title></head><body><nav>N</nav><p>Plain <!-- c --> text</p>"
+             "<script>x</script></body></html>", "TPlain text"),
+            ("<html><body><main id='content'><article>A<div class='content'>B</div></article>C</main>"
+             "<aside>side</aside></body></html>", "ABC"),
+            ("<html><body><div class='content x'>one<div class='content'>two</div></div>"
+             "<div id='main'>m</div></body></html>", "onetwo two"),
+            ("<html><body><main></main><p>fallback</p></body></html>", "fallback"),
+            ("<html><body><header><main>in header</main></header><p>rest</p></body></html>", "rest")
+        ]
+        
+        for html, expected in cases:
+            result = scraper.extract_text_content(BeautifulSoup(html, 'lxml'))
+            if result != expected:
+                print(f"❌ Expected {expected!r}, got {result!r}")
+                return False
+        
+        print(f"✅ Text extraction matches expected output ({len(cases)} cases)")
+        return True
+    except Exception as e:
+        print(f"❌ Error testing text extraction: {e}")
+        return False
+
+def test_proximity_cache():
+    """Test proximity cache hits, misses and eviction with and without SimSIMD"""
+    print("\n🔍 Testing proximity cache...")
+    
+    try:
+        import numpy as np
+        import proximity_cache
+        from proximity_cache import ProximityCache
+        
+        installed = proximity_cache.simsimd
+        backends = [("NumPy", None)]
+        if installed is not None:
+            backends.append(("SimSIMD", installed))
+        else:
+            print("⚠️  simsimd not installed, testing the NumPy fallback only")
+        
+        first, second, third = np.eye(3, dtype=np.float32)
+        nearby = first + np.array([0.0, 0.05, 0.0], dtype=np.float32)
+        nearby /= np.linalg.norm(nearby)
+        
+        try:
+            for name, module in backends:
+                proximity_cache.simsimd = module
+                cache = ProximityCache(capacity=2, tolerance=0.05)
+                cache.put(first, ("first", None))
+                cache.put(second, ("second", None))
+                
+                if cache.get(nearby) != ("first", None):
+                    print(f"❌ {name}: expected a hit for a nearby query")
+                    return False
+                if cache.get(third) is not None:
+                    print(f"❌ {name}: expected a miss for a distant query")
+                    return False
+                
+                # The hit above made "second" the least recently used entry
+                cache.put(third, ("third", None))
+                if cache.get(second) is not None or cache.get(first) != ("first", None) \
+                        or cache.get(third) != ("third", None) or len(cache) != 2:
+                    print(f"❌ {name}: least recently used entry was not evicted")
+                    return False
+                
+                print(f"✅ {name} backend: hit, miss and eviction work")
+        finally:
+            proximity_cache.simsimd = installed
+        
+        return True
+    except Exception as e:
+        print(f"❌ Error testing proximity cache: {e}")
+        return False
+
 def test_environment():
     """Test environment setup"""
     print("\n🔍 Testing environment...")
@@ -193,6 +320,9 @@ def main():
         ("Imports", test_imports),
         ("Configuration", test_config),
         ("Data Files", test_data_files),
+        ("Text Processing", test_text_processing),
+        ("Text Extraction", test_text_extraction),
+        ("Proximity Cache", test_proximity_cache),
         ("Vector Store", test_vector_store),
         ("Chatbot", test_chatbot),
         ("Demo", run_demo)
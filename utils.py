@@ -2,16 +2,25 @@
 Utility functions for PMC Chatbot
 """
 import os
-import json
+import orjson
 import logging
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
 from datetime import datetime
 import re
+import urllib.parse
+import numpy as np
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Code points of the characters treated as sentence endings when chunking
+SENTENCE_ENDINGS = np.array([ord('.'), ord('!'), ord('?')], dtype=np.uint32)
+
+# Patterns used by clean_text, compiled once rather than looked up on every call
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SPECIAL_CHARACTER_PATTERN = re.compile(r'[^\w\s\.\,\!\?\:\;\-\(\)]')
+
 def setup_logging():
     """Setup logging configuration"""
     logging.basicConfig(
@@ -30,10 +39,10 @@ def clean_text(text: str) -> str:
         return ""
     
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = WHITESPACE_PATTERN.sub(' ', text.strip())
     
     # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s\.\,\!\?\:\;\-\(\)]', '', text)
+    text = SPECIAL_CHARACTER_PATTERN.sub('', text)
     
     return text
 
@@ -42,43 +51,60 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     if len(text) <= chunk_size:
         return [text]
     
-    chunks = []
+    # Locate every sentence ending in one vectorized pass over the code points
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    sentence_ends = np.flatnonzero(np.isin(codepoints, SENTENCE_ENDINGS))
+    
+    offsets = []
     start = 0
     
     while start < len(text):
         end = start + chunk_size
         
-        # Try to break at sentence boundary
+        # Try to break at the last sentence boundary near the end of the chunk
         if end < len(text):
-            # Look for sentence endings
-            for i in range(end, max(start + chunk_size - 100, start), -1):
-                if text[i] in '.!?':
-                    end = i + 1
-                    break
+            i = np.searchsorted(sentence_ends, end, side='right') - 1
+            if i >= 0 and sentence_ends[i] > max(start + chunk_size - 100, start):
+                end = int(sentence_ends[i]) + 1
         
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+        offsets.append((start, end))
         
         start = end - overlap
         if start >= len(text):
             break
     
-    return chunks
+    chunks = [text[start:end].strip() for start, end in offsets]
+    return [chunk for chunk in chunks if chunk]
 
 def save_data(data: List[Dict[str, Any]], filename: str):
-    """Save data to JSON file"""
+    """Save data to a JSON Lines file, one document per line"""
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(filename, 'wb') as f:
+        for doc in data:
+            f.write(orjson.dumps(doc) + b'\n')
+
+def resolve_data_file(filename: str) -> str:
+    """Get the path to read a data file from, falling back to a legacy .json copy of a .jsonl file"""
+    if not os.path.exists(filename) and filename.endswith('.jsonl'):
+        legacy_filename = filename[:-1]
+        if os.path.exists(legacy_filename):
+            return legacy_filename
+    return filename
 
-def load_data(filename: str) -> List[Dict[str, Any]]:
-    """Load data from JSON file"""
+def load_data(filename: str) -> Iterator[Dict[str, Any]]:
+    """Load data from a JSON Lines file (or a legacy JSON array file), one document at a time"""
+    filename = resolve_data_file(filename)
     if not os.path.exists(filename):
-        return []
+        return
     
-    with open(filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(filename, 'rb') as f:
+        if filename.endswith('.json'):
+            yield from orjson.loads(f.read())
+            return
+        
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
 
 def get_config() -> Dict[str, Any]:
     """Get configuration from environment variables"""
@@ -87,11 +113,19 @@ def get_config() -> Dict[str, Any]:
         'model_name': os.getenv('MODEL_NAME', 'gpt-3.5-turbo'),
         'temperature': float(os.getenv('TEMPERATURE', '0.7')),
         'max_tokens': int(os.getenv('MAX_TOKENS', '1000')),
+        'history_window': int(os.getenv('HISTORY_WINDOW', '10')),
         'base_url': os.getenv('BASE_URL', 'https://www.pmc.gov.in'),
         'max_pages': int(os.getenv('MAX_PAGES', '50')),
         'request_delay': float(os.getenv('REQUEST_DELAY', '1')),
+        'http_cache_path': os.getenv('HTTP_CACHE_PATH', 'data/http_cache.sqlite'),
+        'http_cache_expire_after': float(os.getenv('HTTP_CACHE_EXPIRE_AFTER', '86400')),
         'chroma_persist_directory': os.getenv('CHROMA_PERSIST_DIRECTORY', './models/chroma_db'),
-        'embedding_model_name': os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+        'embedding_model_name': os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2'),
+        'embedding_cache_directory': os.getenv('EMBEDDING_CACHE_DIRECTORY', 'data'),
+        'embedding_onnx_directory': os.getenv('EMBEDDING_ONNX_DIRECTORY', './models/onnx'),
+        'quantize_embeddings': os.getenv('QUANTIZE_EMBEDDINGS', 'true').lower() == 'true',
+        'cache_capacity': int(os.getenv('CACHE_CAPACITY', '1024')),
+        'cache_tolerance': float(os.getenv('CACHE_TOLERANCE', '0.05'))
     }
 
 def validate_config(config: Dict[str, Any]) -> bool:
@@ -110,6 +144,16 @@ def format_timestamp() -> str:
     """Get formatted timestamp"""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so equivalent forms compare equal"""
+    parts = urllib.parse.urlsplit(url)
+    
+    # Sort query parameters and drop the fragment and trailing slash
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip('/')
+    
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
 def truncate_text(text: str, max_length: int = 500) -> str:
     """Truncate text to specified length"""
     if len(text) <= max_length:
@@ -2,103 +2,275 @@
 Vector store for PMC chatbot using ChromaDB
 """
 import os
+import uuid
 import chromadb
+import tiktoken
+import torch
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 import numpy as np
-from utils import setup_logging, get_config, load_data
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from utils import setup_logging, get_config, load_data, resolve_data_file
+from embedding_cache import EmbeddingCache
+import onnx_encoder
+from onnx_encoder import OnnxEncoder
 
 logger = setup_logging()
 
+# Number of chunks embedded (in one forward pass) and stored together when indexing
+CHUNK_BATCH_SIZE = 256
+
+# Number of recent query embeddings kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+
+# HNSW index settings: 16 graph edges per node, a wide candidate list while
+# building and a narrower one per query for ~99% recall
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+@lru_cache(maxsize=None)
+def get_chroma_client(persist_directory: str):
+    """Open a persistent ChromaDB client, once per directory per process"""
+    return chromadb.PersistentClient(
+        path=persist_directory,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+@lru_cache(maxsize=None)
+def load_embedding_model(model_name: str, device: str, quantize: bool, onnx_directory: str):
+    """Load the fastest available embedding model for a device, once per process"""
+    if device == "cuda":
+        return SentenceTransformer(model_name, device=device).half()
+    
+    if quantize and onnx_encoder.is_available():
+        try:
+            model = OnnxEncoder(model_name, onnx_directory)
+            logger.info("Using int8 quantized ONNX embedding model")
+            return model
+        except Exception as e:
+            logger.warning(f"Could not load quantized embedding model, using full precision: {e}")
+    
+    return SentenceTransformer(model_name, device=device)
+
 class PMCVectorStore:
     def __init__(self):
         self.config = get_config()
         self.persist_directory = self.config['chroma_persist_directory']
         self.embedding_model_name = self.config['embedding_model_name']
         
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=Settings(anonymized_telemetry=False)
+        # Initialize ChromaDB (shared by every vector store in the process)
+        self.client = get_chroma_client(self.persist_directory)
+        
+        # Initialize embedding model: half precision on a GPU, int8 ONNX on CPU when
+        # available; the model is loaded once and shared by every vector store
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.embedding_model = load_embedding_model(
+            self.embedding_model_name, self.device,
+            self.config['quantize_embeddings'], self.config['embedding_onnx_directory']
         )
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        # Chunk embeddings from earlier indexing runs; quantized weights give
+        # slightly different vectors, so they are cached separately
+        namespace = self.embedding_model_name
+        if isinstance(self.embedding_model, OnnxEncoder):
+            namespace += ":int8"
+        self.embedding_cache = EmbeddingCache(self.config['embedding_cache_directory'], namespace)
+        
+        # Tokenizer of the chat model, for sizing retrieved context
+        try:
+            self.encoding = tiktoken.encoding_for_model(self.config['model_name'])
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        
+        # Repeated queries (suggested questions, retries) skip the model entirely
+        self._embed_query = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_query)
+        
+        # Embeddings of known queries (such as suggested questions), kept for the life of the store
+        self.pinned_query_embeddings: Dict[str, np.ndarray] = {}
         
         # Create or get collection
         self.collection = self.client.get_or_create_collection(
             name="pmc_documents",
-            metadata={"hnsw:space": "cosine"}
+            metadata=COLLECTION_METADATA
         )
         
-        logger.info(f"Vector store initialized at {self.persist_directory}")
+        logger.info(f"Vector store initialized at {self.persist_directory} (embeddings on {self.device})")
+    
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with the embedding model"""
+        logger.info(f"Encoding {len(texts)} new chunks")
+        return self.embedding_model.encode(
+            texts, batch_size=CHUNK_BATCH_SIZE, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
     
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for a list of texts"""
+    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Create embeddings for a list of texts, reusing cached ones"""
         try:
-            embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
-            return embeddings.tolist()
+            # Chroma accepts the array directly, so skip building a list of floats
+            embeddings = self.embedding_cache.get_or_create(texts, self.encode_texts)
+            return embeddings.astype(np.float32)
         except Exception as e:
             logger.error(f"Error creating embeddings: {e}")
-            return []
+            return np.empty((0, 0), dtype=np.float32)
     
-    def add_documents(self, documents: List[Dict[str, Any]]) -> bool:
-        """Add documents to the vector store"""
+    def precompute_query_embeddings(self, queries: List[str]):
+        """Embed known queries in one batch so later searches for them skip the model"""
         try:
-            all_texts = []
-            all_metadatas = []
-            all_ids = []
-            
-            for i, doc in enumerate(documents):
-                # Add each chunk as a separate document
-                for j, chunk in enumerate(doc.get('chunks', [])):
-                    if chunk.strip():
-                        all_texts.append(chunk)
-                        all_metadatas.append({
-                            'url': doc.get('url', ''),
-                            'title': doc.get('title', ''),
-                            'chunk_index': j,
-                            'total_chunks': len(doc.get('chunks', [])),
-                            **doc.get('metadata', {})
-                        })
-                        all_ids.append(f"doc_{i}_chunk_{j}")
-            
-            if not all_texts:
-                logger.warning("No valid texts to add to vector store")
-                return False
+            embeddings = self.embedding_model.encode(
+                queries, normalize_embeddings=True, convert_to_numpy=True
+            ).astype(np.float32)
+            embeddings.flags.writeable = False
+            self.pinned_query_embeddings.update(zip(queries, embeddings))
+        except Exception as e:
+            logger.error(f"Error precomputing query embeddings: {e}")
+    
+    def _encode_query(self, text: str) -> np.ndarray:
+        """Encode a single query as a read-only normalized vector"""
+        pinned = self.pinned_query_embeddings.get(text)
+        if pinned is not None:
+            return pinned
+        
+        embedding = self.embedding_model.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+        
+        # The cache hands the same array to every caller, so guard it against mutation
+        embedding.flags.writeable = False
+        return embedding
+    
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Create a normalized embedding for a single text"""
+        try:
+            return self._embed_query(text)
+        except Exception as e:
+            logger.error(f"Error embedding text: {e}")
+            return None
+    
+    def iter_chunks(self, documents: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield each non-empty chunk of each document with its metadata"""
+        for doc in documents:
+            # Add each chunk as a separate document
+            chunks = doc.get('chunks', [])
+            for j, chunk in enumerate(chunks):
+                if chunk.strip():
+                    yield chunk, {
+                        'url': doc.get('url', ''),
+                        'title': doc.get('title', ''),
+                        'chunk_index': j,
+                        'total_chunks': len(chunks),
+                        **doc.get('metadata', {})
+                    }
+    
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> bool:
+        """Add documents to the vector store, one batch of chunks at a time"""
+        # Ids of every batch sent to the collection, so a failed run can be undone
+        added_ids: List[List[str]] = []
+        try:
+            chunks = self.iter_chunks(documents)
+            total_chunks = 0
+            pending = None
+            success = True
+            
+            # Each batch is stored on the worker thread while the next one is embedded here
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                while True:
+                    batch = list(islice(chunks, CHUNK_BATCH_SIZE))
+                    if not batch:
+                        break
+                    
+                    texts = [text for text, _ in batch]
+                    metadatas = [metadata for _, metadata in batch]
+                    
+                    # Create embeddings for the batch in one pass
+                    embeddings = self.create_embeddings(texts)
+                    
+                    if len(embeddings) == 0:
+                        logger.error("Failed to create embeddings")
+                        success = False
+                        break
+                    
+                    # Wait for the previous batch before queueing this one
+                    if pending is not None and not pending.result():
+                        success = False
+                        break
+                    
+                    ids = [uuid.uuid4().hex for _ in texts]
+                    added_ids.append(ids)
+                    pending = executor.submit(self.add_batch, embeddings, texts, metadatas, ids)
+                    total_chunks += len(texts)
+                
+                if success and pending is not None and not pending.result():
+                    success = False
             
-            # Create embeddings
-            embeddings = self.create_embeddings(all_texts)
+            # Never leave a partial index behind, since indexing is skipped once
+            # the collection has any documents
+            if not success:
+                self.remove_chunks(added_ids)
+                return False
             
-            if not embeddings:
-                logger.error("Failed to create embeddings")
+            if not total_chunks:
+                logger.warning("No valid texts to add to vector store")
                 return False
             
-            # Add to collection
+            logger.info(f"Indexed {total_chunks} chunks")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error adding documents to vector store: {e}")
+            self.remove_chunks(added_ids)
+            return False
+        finally:
+            # Save newly encoded chunks once per run rather than once per batch
+            try:
+                self.embedding_cache.flush()
+            except Exception as e:
+                logger.error(f"Error saving embedding cache: {e}")
+    
+    def remove_chunks(self, id_batches: List[List[str]]):
+        """Delete the chunks added by an indexing run that did not complete"""
+        try:
+            for ids in id_batches:
+                self.collection.delete(ids=ids)
+            if id_batches:
+                logger.info(f"Removed {sum(len(ids) for ids in id_batches)} partially indexed chunks")
+        except Exception as e:
+            logger.error(f"Error removing partially indexed chunks: {e}")
+    
+    def add_batch(self, embeddings: np.ndarray, texts: List[str],
+                  metadatas: List[Dict[str, Any]], ids: List[str]) -> bool:
+        """Add pre-computed embeddings and their chunks to the collection"""
+        try:
             self.collection.add(
                 embeddings=embeddings,
-                documents=all_texts,
-                metadatas=all_metadatas,
-                ids=all_ids
+                documents=texts,
+                metadatas=metadatas,
+                ids=ids
             )
             
-            logger.info(f"Added {len(all_texts)} document chunks to vector store")
+            logger.info(f"Added {len(texts)} document chunks to vector store")
             return True
             
         except Exception as e:
-            logger.error(f"Error adding documents to vector store: {e}")
+            logger.error(f"Error adding batch to vector store: {e}")
             return False
     
-    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, n_results: int = 5,
+               query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
         """Search for similar documents"""
         try:
-            # Create query embedding
-            query_embedding = self.embedding_model.encode([query])
+            # Create query embedding unless the caller already has one
+            if query_embedding is None:
+                query_embedding = self._embed_query(query)
             
             # Search in collection
             results = self.collection.query(
-                query_embeddings=query_embedding.tolist(),
+                query_embeddings=[query_embedding.tolist()],
                 n_results=n_results,
                 include=['documents', 'metadatas', 'distances']
             )
@@ -144,13 +316,13 @@ class PMCVectorStore:
             self.client.delete_collection("pmc_documents")
             self.collection = self.client.create_collection(
                 name="pmc_documents",
-                metadata={"hnsw:space": "cosine"}
+                metadata=COLLECTION_METADATA
             )
             logger.info("Collection cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing collection: {e}")
     
-    def load_and_index_data(self, data_file: str = "data/pmc_scraped_data.json") -> bool:
+    def load_and_index_data(self, data_file: str = "data/pmc_scraped_data.jsonl") -> bool:
         """Load data from file and index it in the vector store"""
         try:
             # Check if data already exists in vector store
@@ -158,16 +330,14 @@ class PMCVectorStore:
                 logger.info("Vector store already contains data. Skipping indexing.")
                 return True
             
-            # Load data from file
-            documents = load_data(data_file)
-            if not documents:
+            if not os.path.exists(resolve_data_file(data_file)):
                 logger.warning(f"No data found in {data_file}")
                 return False
             
-            # Add documents to vector store
-            success = self.add_documents(documents)
+            # Stream documents from the file into the vector store
+            success = self.add_documents(load_data(data_file))
             if success:
-                logger.info(f"Successfully indexed {len(documents)} documents")
+                logger.info(f"Successfully indexed documents from {data_file}")
             else:
                 logger.error("Failed to index documents")
             
@@ -177,11 +347,12 @@ class PMCVectorStore:
             logger.error(f"Error loading and indexing data: {e}")
             return False
     
-    def get_relevant_context(self, query: str, max_tokens: int = 2000) -> str:
+    def get_relevant_context(self, query: str, max_tokens: int = 2000,
+                             query_embedding: Optional[np.ndarray] = None) -> str:
         """Get relevant context for a query, respecting token limits"""
         try:
             # Search for relevant documents
-            results = self.search(query, n_results=10)
+            results = self.search(query, n_results=10, query_embedding=query_embedding)
             
             if not results:
                 return ""
@@ -191,18 +362,22 @@ class PMCVectorStore:
             current_tokens = 0
             
             for result in results:
-                content = result['content']
-                # Rough token estimation (1 token ≈ 4 characters)
-                estimated_tokens = len(content) // 4
+                part = f"Source: {result['metadata'].get('title', 'Unknown')}\n{result['content']}"
+                tokens = self.encoding.encode(part)
                 
-                if current_tokens + estimated_tokens > max_tokens:
+                # Truncate the last chunk to fill the remaining budget exactly
+                remaining = max_tokens - current_tokens
+                if len(tokens) > remaining:
+                    if remaining > 0:
+                        context_parts.append(self.encoding.decode(tokens[:remaining]))
+                        current_tokens += remaining
                     break
                 
-                context_parts.append(f"Source: {result['metadata'].get('title', 'Unknown')}\n{content}")
-                current_tokens += estimated_tokens
+                context_parts.append(part)
+                current_tokens += len(tokens)
             
             context = "\n\n".join(context_parts)
-            logger.info(f"Generated context with ~{current_tokens} tokens")
+            logger.info(f"Generated context with {current_tokens} tokens")
             
             return context
             
@@ -210,6 +385,15 @@ class PMCVectorStore:
             logger.error(f"Error getting relevant context: {e}")
             return ""
 
+def warmup():
+    """Load the embedding model and ChromaDB client ahead of the first request"""
+    try:
+        # One encode pays one-time setup costs (CUDA kernels, ONNX session) up front
+        PMCVectorStore().embed("warmup")
+        logger.info("Vector store warmed up")
+    except Exception as e:
+        logger.error(f"Error warming up vector store: {e}")
+
 def main():
     """Test the vector store"""
     try: